@@ -2,11 +2,81 @@
 
 import logging
 
+import numpy as np
 import pandas as pd
 
 logger = logging.getLogger(__name__)
 
 
+def _group_bounds(item_ids: np.ndarray) -> tuple:
+    """Get start and end offsets of each item_id run in an array sorted by item_id."""
+    # Single item (common for per-item runs): the whole array is one group
+    if item_ids[0] == item_ids[-1]:
+        return np.array([0]), np.array([len(item_ids)])
+
+    # Sorted input means a new group starts wherever the value changes, so no
+    # hash-based factorization of item_id is needed
+    starts = np.flatnonzero(np.r_[True, item_ids[1:] != item_ids[:-1]])
+    ends = np.append(starts[1:], len(item_ids))
+    return starts, ends
+
+
+def _is_sorted_by_item_and_date(sales_df: pd.DataFrame) -> bool:
+    """Check whether rows are already ordered by (item_id, date)."""
+    item_ids = sales_df["item_id"].to_numpy()
+    dates = sales_df["date"].to_numpy()
+    same_item = item_ids[1:] == item_ids[:-1]
+    return bool(np.all((item_ids[1:] > item_ids[:-1]) | (same_item & (dates[1:] >= dates[:-1]))))
+
+
+def _sorted_sales(sales_df: pd.DataFrame) -> pd.DataFrame:
+    """Get sales with datetime dates, ordered by (item_id, date)."""
+    # Ensure date is datetime (load_sales_data already returns datetime64 dates)
+    if not pd.api.types.is_datetime64_any_dtype(sales_df["date"]):
+        sales_df = sales_df.assign(date=pd.to_datetime(sales_df["date"]))
+
+    # Sort by item_id and date, unless the loader already returned them in that order
+    if not _is_sorted_by_item_and_date(sales_df):
+        sales_df = sales_df.sort_values(["item_id", "date"])
+    return sales_df
+
+
+def _lag_rolling_features(qty: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> dict:
+    """
+    Compute lag_1, lag_7, rolling_7 and rolling_28 in one pass over each group.
+
+    Both rolling means (min_periods=1) share a single cumulative sum per group,
+    so each window costs O(N). Lags are zero-filled at the start of a group.
+    """
+    features = {name: np.zeros_like(qty) for name in ["lag_1", "lag_7", "rolling_7", "rolling_28"]}
+    for start, end in zip(starts, ends):
+        group = qty[start:end]
+        csum = np.concatenate(([0.0], np.cumsum(group)))
+        positions = np.arange(1, end - start + 1)
+
+        for lag in (1, 7):
+            features[f"lag_{lag}"][start + lag : end] = group[:-lag]
+
+        for window in (7, 28):
+            counts = np.minimum(positions, window)
+            features[f"rolling_{window}"][start:end] = (
+                csum[positions] - csum[positions - counts]
+            ) / counts
+    return features
+
+
+def _last_window_means(
+    qty: np.ndarray, starts: np.ndarray, ends: np.ndarray, window: int
+) -> np.ndarray:
+    """Mean of the last `window` values (or fewer, min_periods=1) of each group."""
+    lows = np.maximum(starts, ends - window)
+    # reduceat sums each [low, end) slice in one pass; every other result spans the
+    # gap to the next group and is dropped. The appended zero keeps the final end
+    # index in bounds
+    sums = np.add.reduceat(np.append(qty, 0.0), np.column_stack([lows, ends]).ravel())[::2]
+    return sums / (ends - lows)
+
+
 def build_features(sales_df: pd.DataFrame, config: dict) -> pd.DataFrame:
     """
     Build time-series features from sales data.
@@ -39,12 +109,7 @@ def build_features(sales_df: pd.DataFrame, config: dict) -> pd.DataFrame:
             ]
         )
 
-    # Ensure date is datetime
-    sales_df = sales_df.copy()
-    sales_df["date"] = pd.to_datetime(sales_df["date"])
-
-    # Sort by date and item_id
-    sales_df = sales_df.sort_values(["item_id", "date"])
+    sales_df = _sorted_sales(sales_df)
 
     # Initialize feature DataFrame with all available columns
     base_cols = ["date", "item_id", "quantity"]
@@ -53,7 +118,8 @@ def build_features(sales_df: pd.DataFrame, config: dict) -> pd.DataFrame:
     if "is_holiday" in sales_df.columns:
         base_cols.append("is_holiday")
 
-    feature_df = sales_df[base_cols].copy()
+    # Column selection already returns a new DataFrame, so the input is never modified
+    feature_df = sales_df[base_cols]
 
     # Ensure promotion_discount and is_holiday exist with defaults
     if "promotion_discount" not in feature_df.columns:
@@ -72,24 +138,43 @@ def build_features(sales_df: pd.DataFrame, config: dict) -> pd.DataFrame:
     feature_df["day_of_week"] = feature_df["date"].dt.dayofweek
     feature_df["month"] = feature_df["date"].dt.month
 
-    # Lag features (grouped by item_id)
-    feature_df["lag_1"] = feature_df.groupby("item_id")["quantity"].shift(1).fillna(0)
-    feature_df["lag_7"] = feature_df.groupby("item_id")["quantity"].shift(7).fillna(0)
-
-    # Rolling averages (grouped by item_id)
-    feature_df["rolling_7"] = (
-        feature_df.groupby("item_id")["quantity"]
-        .transform(lambda x: x.rolling(window=7, min_periods=1).mean())
-        .fillna(0)
-    )
-    feature_df["rolling_28"] = (
-        feature_df.groupby("item_id")["quantity"]
-        .transform(lambda x: x.rolling(window=28, min_periods=1).mean())
-        .fillna(0)
-    )
+    # Lag and rolling features, computed per item_id run over the sorted array
+    qty = feature_df["quantity"].to_numpy(dtype=np.float64)
+    starts, ends = _group_bounds(feature_df["item_id"].to_numpy())
+    for name, values in _lag_rolling_features(qty, starts, ends).items():
+        feature_df[name] = values
 
-    # Convert date back to string for consistency
-    feature_df["date"] = feature_df["date"].dt.strftime("%Y-%m-%d")
+    # Convert date back to string for consistency (formatting each unique date once)
+    unique_dates = feature_df["date"].unique()
+    date_strings = dict(zip(unique_dates, pd.DatetimeIndex(unique_dates).strftime("%Y-%m-%d")))
+    feature_df["date"] = feature_df["date"].map(date_strings)
 
     logger.info(f"Feature building complete: {len(feature_df)} rows with features")
     return feature_df
+
+
+def build_latest_features(sales_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Get the last known lag and rolling values of each item, as seen from the
+    day after its latest sale.
+
+    Returns DataFrame indexed by item_id with columns lag_1, lag_7, rolling_7, rolling_28.
+    """
+    columns = ["lag_1", "lag_7", "rolling_7", "rolling_28"]
+    if sales_df.empty:
+        return pd.DataFrame(columns=columns, index=pd.Index([], name="item_id"), dtype=float)
+
+    sales_df = _sorted_sales(sales_df)
+    qty = sales_df["quantity"].to_numpy(dtype=np.float64)
+    item_ids = sales_df["item_id"].to_numpy()
+    starts, ends = _group_bounds(item_ids)
+
+    return pd.DataFrame(
+        {
+            "lag_1": qty[ends - 1],
+            "lag_7": np.where(ends - starts >= 7, qty[np.maximum(ends - 7, starts)], 0.0),
+            "rolling_7": _last_window_means(qty, starts, ends, 7),
+            "rolling_28": _last_window_means(qty, starts, ends, 28),
+        },
+        index=pd.Index(item_ids[starts], name="item_id"),
+    )
@@ -1,15 +1,58 @@
 """Load and ingest sales data."""
 
 import logging
-from datetime import datetime, timedelta
+import sqlite3
+from contextlib import closing
+from datetime import datetime
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
-from src.utils.db import get_connection, init_database
+from src.utils.db import configure_bulk_write, get_connection, init_database
 
 logger = logging.getLogger(__name__)
 
+SAMPLE_INSERT_CHUNK_SIZE = 10_000
+
+# Range of SQLite INTEGER values, for references used directly as item ids
+_INT64_MIN = -(2**63)
+_INT64_MAX = 2**63 - 1
+
+_SALES_INSERT_SQL = (
+    "INSERT OR REPLACE INTO daily_item_sales "
+    "(date, item_id, quantity, promotion_discount, is_holiday) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+
+# Row layout of daily_item_sales records built for _SALES_INSERT_SQL
+_SALES_RECORD_DTYPE = np.dtype(
+    [
+        ("date", "U10"),
+        ("item_id", "int64"),
+        ("quantity", "float64"),
+        ("promotion_discount", "float64"),
+        ("is_holiday", "int64"),
+    ]
+)
+
+# Sales rows load_sales_data can read into _SALES_ROW_DTYPE: a date SQLite can
+# parse, and non-null item_id and quantity (promotion/holiday are COALESCEd)
+_VALID_SALES_ROW = (
+    "julianday(daily_item_sales.date) IS NOT NULL AND item_id IS NOT NULL AND quantity IS NOT NULL"
+)
+
+# Row layout returned by the load_sales_data query (dates as epoch days)
+_SALES_ROW_DTYPE = np.dtype(
+    [
+        ("date", "int64"),
+        ("item_id", "int64"),
+        ("quantity", "float64"),
+        ("promotion_discount", "float64"),
+        ("is_holiday", "int64"),
+    ]
+)
+
 
 def clean_spanish_number(value):
     """
@@ -64,6 +107,120 @@ def clean_spanish_number(value):
         return 0.0
 
 
+def clean_spanish_numbers(values: pd.Series) -> pd.Series:
+    """
+    Vectorized version of clean_spanish_number for a whole column.
+    Values that cannot be parsed are returned as 0.0.
+    """
+    # Columns already parsed as numbers by read_csv need no string handling
+    if pd.api.types.is_numeric_dtype(values):
+        return values.fillna(0.0).astype(float)
+
+    str_vals = (
+        values.astype(str)
+        .str.strip()
+        .str.replace('"', "", regex=False)
+        .str.replace("'", "", regex=False)
+    )
+    parsed = pd.to_numeric(str_vals, errors="coerce")
+
+    # Only values that are not plain numbers need separator handling
+    pending = parsed.isna() & values.notna()
+    if pending.any():
+        str_vals = str_vals[pending]
+        # A single comma followed by at most two characters is a decimal separator
+        # (Spanish format), otherwise commas/dots are thousands separators
+        decimal_comma = str_vals.str.match(r"^[^,]*,[^,]{0,2}$", na=False)
+        has_comma = str_vals.str.contains(",", regex=False, na=False)
+        spanish = str_vals.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+        us = str_vals.str.replace(",", "", regex=False)
+        dotted = str_vals.str.replace(".", "", regex=False)
+        normalized = spanish.where(decimal_comma, us.where(has_comma, dotted))
+        parsed[pending] = pd.to_numeric(normalized, errors="coerce")
+
+    return parsed.fillna(0.0).astype(float)
+
+
+def _write_hipos_rows(conn: sqlite3.Connection, rows: pd.DataFrame, date: str) -> tuple:
+    """
+    Write HIPOS sales rows (referencia, articulo, quantity) for a date, creating
+    items for unknown references.
+
+    Returns:
+        tuple: (ids of the created items, number of sales records inserted)
+    """
+    # Map references to item ids once, falling back to the "name (REF)" format for
+    # items created before the referencia column existed
+    items_df = pd.read_sql_query("SELECT id, name, referencia FROM items ORDER BY id", conn)
+    items_df["referencia"] = items_df["referencia"].where(
+        items_df["referencia"].notna(),
+        items_df["name"].str.extract(r"\(([^()]*)\)\s*$", expand=False),
+    )
+    known_refs = items_df.dropna(subset=["referencia"]).drop_duplicates("referencia")
+    ref_to_id = dict(zip(known_refs["referencia"], known_refs["id"].tolist()))
+    known_ids = set(items_df["id"].tolist())
+
+    # Write new items and sales in a single transaction
+    cursor = conn.cursor()
+    conn.execute("BEGIN")
+    items_created = set()
+    unique_refs = rows.drop_duplicates("referencia")
+    for referencia, articulo in zip(unique_refs["referencia"], unique_refs["articulo"]):
+        if referencia in ref_to_id:
+            continue
+
+        # Try to use referencia as ID if it's numeric and fits SQLite's INTEGER,
+        # otherwise let SQLite assign the next rowid
+        name = f"{articulo} ({referencia})"
+        try:
+            item_id = int(referencia)
+        except ValueError:
+            item_id = None
+        if item_id is not None and not _INT64_MIN <= item_id <= _INT64_MAX:
+            item_id = None
+
+        # A failing reference is skipped with its sales, not the whole file
+        try:
+            if item_id is None:
+                cursor.execute(
+                    "INSERT INTO items (name, referencia) VALUES (?, ?)", (name, referencia)
+                )
+                item_id = cursor.lastrowid
+                items_created.add(item_id)
+            elif item_id not in known_ids:
+                cursor.execute(
+                    "INSERT INTO items (id, name, referencia) VALUES (?, ?, ?)",
+                    (item_id, name, referencia),
+                )
+                items_created.add(item_id)
+        except sqlite3.Error as e:
+            logger.warning(f"Error processing item {referencia}: {e}")
+            continue
+
+        known_ids.add(item_id)
+        ref_to_id[referencia] = item_id
+
+    # Aggregate sales by item_id (in case same item appears multiple times)
+    has_item = rows["referencia"].isin(ref_to_id.keys())
+    item_ids = rows["referencia"][has_item].map(ref_to_id).to_numpy(dtype=np.int64)
+    quantities = rows["quantity"][has_item].to_numpy(dtype=np.float64)
+    order = np.argsort(item_ids, kind="stable")
+    item_ids = item_ids[order]
+    starts = np.r_[0, np.flatnonzero(np.diff(item_ids)) + 1][: len(item_ids)]
+    totals = np.add.reduceat(quantities[order], starts)
+
+    # Insert aggregated sales data
+    sales_records = np.empty(len(starts), dtype=_SALES_RECORD_DTYPE)
+    sales_records["date"] = date
+    sales_records["item_id"] = item_ids[starts]
+    sales_records["quantity"] = totals
+    sales_records["promotion_discount"] = 0.0
+    sales_records["is_holiday"] = 0
+    cursor.executemany(_SALES_INSERT_SQL, sales_records.tolist())
+
+    return items_created, len(sales_records)
+
+
 def preprocess_hipos_file(hipos_file_path: str, date: str = None, config: dict = None) -> None:
     """
     Preprocess HIPOS output CSV file and load into database.
@@ -76,7 +233,7 @@ def preprocess_hipos_file(hipos_file_path: str, date: str = None, config: dict =
     The HIPOS file is expected to have:
     - Column 0: Referencia (item reference code)
     - Column 1: Artículo (item name)
-    - Column 7: Venta (sales quantity, negative values indicate sales)
+    - Column 8: Venta (sales quantity, negative values indicate sales)
     - Other columns: Stock, costs, etc. (not used)
     """
     if config is None:
@@ -89,9 +246,10 @@ def preprocess_hipos_file(hipos_file_path: str, date: str = None, config: dict =
         date = datetime.now().strftime("%Y-%m-%d")
         logger.info(f"No date provided, using today's date: {date}")
 
-    # Validate date format
+    # Validate date format, storing it zero-padded (strptime also accepts
+    # "2026-1-5", which SQLite date functions do not)
     try:
-        datetime.strptime(date, "%Y-%m-%d")
+        date = datetime.strptime(date, "%Y-%m-%d").strftime("%Y-%m-%d")
     except ValueError:
         raise ValueError(f"Invalid date format: {date}. Expected YYYY-MM-DD")
 
@@ -100,123 +258,60 @@ def preprocess_hipos_file(hipos_file_path: str, date: str = None, config: dict =
     if not file_path.exists():
         raise FileNotFoundError(f"HIPOS file not found: {hipos_file_path}")
 
+    # Read only the used columns as raw strings: reference (column 0), item name
+    # (column 1) and sales quantity (column 8 = "Venta")
+    csv_options = {
+        "usecols": [0, 1, 8],
+        "names": ["referencia", "articulo", "venta"],
+        "header": 0,
+        "dtype": str,
+        "na_filter": False,
+        "engine": "c",
+    }
+
     # Read CSV with proper encoding (try UTF-8 first, then latin-1)
     try:
-        df = pd.read_csv(file_path, encoding="utf-8")
-    except UnicodeDecodeError:
-        logger.warning("UTF-8 encoding failed, trying latin-1")
-        df = pd.read_csv(file_path, encoding="latin-1")
+        try:
+            df = pd.read_csv(file_path, encoding="utf-8", **csv_options)
+        except UnicodeDecodeError:
+            logger.warning("UTF-8 encoding failed, trying latin-1")
+            df = pd.read_csv(file_path, encoding="latin-1", **csv_options)
+    except pd.errors.ParserError as e:
+        raise ValueError(
+            f"Could not read HIPOS file {hipos_file_path}: expected the sales quantity "
+            f"(Venta) in column 8 ({e})"
+        ) from e
 
     logger.info(f"Loaded {len(df)} rows from HIPOS file")
 
+    referencias = df["referencia"].str.strip()
+    articulos = df["articulo"].str.strip()
+    articulos = articulos.where(articulos != "", referencias)
+    venta = clean_spanish_numbers(df["venta"])
+
+    # Sales are negative in HIPOS, keep only rows with sales as positive quantities
+    has_sales = (referencias != "") & (referencias != "nan") & (venta < 0)
+    rows = pd.DataFrame(
+        {
+            "referencia": referencias[has_sales],
+            "articulo": articulos[has_sales],
+            "quantity": -venta[has_sales],
+        }
+    )
+
     # Initialize database
     init_database(config)
-    conn = get_connection(config)
-    cursor = conn.cursor()
-
-    # Process each row
-    sales_records = []
-    items_created = set()
-
-    for idx, row in df.iterrows():
-        try:
-            # Extract item reference (column 0)
-            referencia = str(row.iloc[0]).strip() if pd.notna(row.iloc[0]) else None
-            if not referencia or referencia == "nan":
-                continue
-
-            # Extract item name (column 1) for creating items
-            articulo = str(row.iloc[1]).strip() if pd.notna(row.iloc[1]) else referencia
-
-            # Extract sales quantity (column 8, index 8 = "Venta")
-            venta_raw = row.iloc[8] if len(row) > 8 else 0
-
-            # Clean and convert sales quantity
-            venta_quantity = clean_spanish_number(venta_raw)
 
-            # Sales are negative in HIPOS, convert to positive quantity
-            quantity = abs(venta_quantity) if venta_quantity < 0 else 0.0
-
-            # Skip if no sales
-            if quantity == 0:
-                continue
-
-            # Get or create item
-            item_id = None
-            item_was_created = False
-
-            # First, try to find item by name containing referencia
-            cursor.execute("SELECT id FROM items WHERE name LIKE ?", (f"%{referencia}%",))
-            item_result = cursor.fetchone()
-
-            if item_result:
-                item_id = item_result[0]
-            else:
-                # Try to use referencia as ID if it's numeric
-                try:
-                    potential_id = int(referencia)
-                    # Check if this ID already exists
-                    cursor.execute("SELECT id FROM items WHERE id = ?", (potential_id,))
-                    if cursor.fetchone():
-                        item_id = potential_id
-                    else:
-                        # ID doesn't exist, use it for new item
-                        item_id = potential_id
-                        item_was_created = True
-                except (ValueError, TypeError):
-                    # Referencia is not numeric, get next available ID
-                    cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM items")
-                    item_id = cursor.fetchone()[0]
-                    item_was_created = True
-
-                # Insert new item (only if it doesn't exist)
-                cursor.execute(
-                    "INSERT OR IGNORE INTO items (id, name) VALUES (?, ?)",
-                    (item_id, f"{articulo} ({referencia})"),
-                )
-                # Check if row was actually inserted
-                if item_was_created:
-                    # Verify it was created (not ignored)
-                    cursor.execute(
-                        "SELECT id FROM items WHERE id = ? AND name = ?",
-                        (item_id, f"{articulo} ({referencia})"),
-                    )
-                    if cursor.fetchone():
-                        items_created.add(item_id)
-
-            # Add to sales records
-            sales_records.append((date, item_id, float(quantity), 0.0, 0))
-
-        except Exception as e:
-            logger.warning(f"Error processing row {idx}: {e}")
-            continue
-
-    # Aggregate sales by item_id (in case same item appears multiple times)
-    sales_dict = {}
-    for date_str, item_id, qty, promo, holiday in sales_records:
-        key = (date_str, item_id)
-        if key in sales_dict:
-            sales_dict[key] = (date_str, item_id, sales_dict[key][2] + qty, promo, holiday)
-        else:
-            sales_dict[key] = (date_str, item_id, qty, promo, holiday)
-
-    # Insert aggregated sales data
-    aggregated_records = list(sales_dict.values())
-    cursor.executemany(
-        (
-            "INSERT OR REPLACE INTO daily_item_sales "
-            "(date, item_id, quantity, promotion_discount, is_holiday) "
-            "VALUES (?, ?, ?, ?, ?)"
-        ),
-        aggregated_records,
-    )
-
-    conn.commit()
-    conn.close()
+    # The connection context commits on success and rolls back on error, and
+    # closing() always closes it
+    with closing(get_connection(config)) as conn:
+        configure_bulk_write(conn)
+        with conn:
+            items_created, records_inserted = _write_hipos_rows(conn, rows, date)
 
     logger.info(
         f"Preprocessed HIPOS file: created {len(items_created)} new items, "
-        f"inserted {len(aggregated_records)} sales records for date {date}"
+        f"inserted {records_inserted} sales records for date {date}"
     )
 
 
@@ -236,35 +331,49 @@ def load_sales_data(config: dict) -> pd.DataFrame:
     conn = get_connection(config)
 
     try:
+        # Rows that cannot be read into typed arrays are skipped rather than
+        # failing the whole load
+        skipped = conn.execute(
+            f"SELECT COUNT(*) FROM daily_item_sales WHERE NOT ({_VALID_SALES_ROW})"
+        ).fetchone()[0]
+        if skipped:
+            logger.warning(
+                f"Skipping {skipped} sales records with a missing item_id or quantity, "
+                "or a date not in YYYY-MM-DD format"
+            )
+
+        # Dates are returned as epoch days so they convert to datetime64 without
+        # string parsing. Rows are ordered by (item_id, date), the order
+        # build_features works in, so it does not need to re-sort them.
         query = (
-            "SELECT date, item_id, quantity, "
+            "SELECT CAST(julianday(date) - 2440587.5 AS INTEGER) as date, item_id, quantity, "
             "COALESCE(promotion_discount, 0) as promotion_discount, "
             "COALESCE(is_holiday, 0) as is_holiday "
-            "FROM daily_item_sales ORDER BY date, item_id"
+            f"FROM daily_item_sales WHERE {_VALID_SALES_ROW} "
+            "ORDER BY item_id, daily_item_sales.date"
         )
-        df = pd.read_sql_query(query, conn)
-        conn.close()
-
-        if df.empty:
-            logger.info("No sales data found, returning empty DataFrame")
-            return pd.DataFrame(
-                columns=["date", "item_id", "quantity", "promotion_discount", "is_holiday"]
-            )
-
-        # Ensure proper types
-        df["promotion_discount"] = df["promotion_discount"].fillna(0.0).astype(float)
-        df["is_holiday"] = df["is_holiday"].fillna(0).astype(int)
-
-        logger.info(f"Loaded {len(df)} sales records")
-        return df
-
-    except Exception as e:
+        # Stream rows straight into typed arrays
+        records = np.fromiter(conn.execute(query), dtype=_SALES_ROW_DTYPE)
+    except sqlite3.Error as e:
         logger.warning(f"Error loading sales data: {e}, returning empty DataFrame")
+        return pd.DataFrame(
+            columns=["date", "item_id", "quantity", "promotion_discount", "is_holiday"]
+        )
+    finally:
         conn.close()
+
+    df = pd.DataFrame(records)
+    if df.empty:
+        logger.info("No sales data found, returning empty DataFrame")
         return pd.DataFrame(
             columns=["date", "item_id", "quantity", "promotion_discount", "is_holiday"]
         )
 
+    df["date"] = pd.to_datetime(df["date"].to_numpy(), unit="D")
+
+    logger.info(f"Loaded {len(df)} sales records")
+    return df
+
 
 def create_sample_data(config: dict, num_items: int = 3, days: int = 60) -> None:
     """
@@ -279,80 +388,70 @@ def create_sample_data(config: dict, num_items: int = 3, days: int = 60) -> None
 
     init_database(config)
     conn = get_connection(config)
+    configure_bulk_write(conn)
     cursor = conn.cursor()
 
-    # Create sample items
-    import random
+    # Write items and sales in a single transaction
+    conn.execute("BEGIN")
 
-    for i in range(1, num_items + 1):
-        try:
-            cursor.execute("INSERT OR IGNORE INTO items (id, name) VALUES (?, ?)", (i, f"Item_{i}"))
-        except Exception:
-            pass  # Item may already exist
-
-    # Generate sales data
-    today = datetime.now()
-    sales_records = []
-
-    for day_offset in range(days, 0, -1):
-        date = today - timedelta(days=day_offset)
-        date_str = date.strftime("%Y-%m-%d")
-        day_of_week = date.weekday()
-
-        # Determine if this is a holiday (~10% of days, with preference
-        # for weekends and month-end)
-        is_holiday = 0
-        holiday_prob = (
-            random.random() < 0.1
-            or (day_of_week >= 5 and random.random() < 0.2)
-            or (date.day >= 28 and random.random() < 0.15)
-        )
-        if holiday_prob:
-            is_holiday = 1
-
-        for item_id in range(1, num_items + 1):
-            # Generate promotion discount (~15% of days have promotions)
-            promotion_discount = 0.0
-            if random.random() < 0.15:
-                promotion_discount = round(random.uniform(10.0, 30.0), 1)
-
-            # Generate realistic sales with some seasonality
-            base_sales = 10 + item_id * 5
-            # Higher sales on weekends
-            weekend_multiplier = 1.5 if day_of_week >= 5 else 1.0
-            # Promotions boost sales (1.2x to 1.5x multiplier based on discount)
-            if promotion_discount > 0:
-                promotion_multiplier = 1.0 + (promotion_discount / 100.0) * 0.5
-            else:
-                promotion_multiplier = 1.0
-            # Holidays may affect sales (slight increase)
-            holiday_multiplier = 1.1 if is_holiday else 1.0
-            # Add some randomness
-            quantity = max(
-                0,
-                int(
-                    base_sales
-                    * weekend_multiplier
-                    * promotion_multiplier
-                    * holiday_multiplier
-                    * random.uniform(0.7, 1.3)
-                ),
-            )
+    # Create sample items
+    cursor.executemany(
+        "INSERT OR IGNORE INTO items (id, name) VALUES (?, ?)",
+        [(i, f"Item_{i}") for i in range(1, num_items + 1)],
+    )
 
-            sales_records.append(
-                (date_str, item_id, float(quantity), float(promotion_discount), int(is_holiday))
-            )
+    # Generate sales data for all (day, item) combinations at once
+    rng = np.random.default_rng()
+    shape = (days, num_items)
+    dates = pd.date_range(end=pd.Timestamp.now().normalize() - pd.Timedelta(days=1), periods=days)
+    day_of_week = dates.dayofweek.to_numpy()
+    day_of_month = dates.day.to_numpy()
+
+    # Determine holidays (~10% of days, with preference for weekends and month-end)
+    is_holiday = (
+        (rng.random(days) < 0.1)
+        | ((day_of_week >= 5) & (rng.random(days) < 0.2))
+        | ((day_of_month >= 28) & (rng.random(days) < 0.15))
+    ).astype(int)
+
+    # Generate promotion discount (~15% of days have promotions)
+    promotion_discount = np.where(
+        rng.random(shape) < 0.15, np.round(rng.uniform(10.0, 30.0, shape), 1), 0.0
+    )
 
-    # Insert sales data
-    cursor.executemany(
+    # Generate realistic sales with some seasonality
+    base_sales = 10 + np.arange(1, num_items + 1) * 5
+    # Higher sales on weekends
+    weekend_multiplier = np.where(day_of_week >= 5, 1.5, 1.0)[:, None]
+    # Promotions boost sales (1.2x to 1.5x multiplier based on discount)
+    promotion_multiplier = 1.0 + (promotion_discount / 100.0) * 0.5
+    # Holidays may affect sales (slight increase)
+    holiday_multiplier = np.where(is_holiday == 1, 1.1, 1.0)[:, None]
+    # Add some randomness
+    quantity = np.maximum(
+        0,
         (
-            "INSERT OR REPLACE INTO daily_item_sales "
-            "(date, item_id, quantity, promotion_discount, is_holiday) "
-            "VALUES (?, ?, ?, ?, ?)"
-        ),
-        sales_records,
+            base_sales
+            * weekend_multiplier
+            * promotion_multiplier
+            * holiday_multiplier
+            * rng.uniform(0.7, 1.3, shape)
+        ).astype(int),
     )
 
+    num_records = days * num_items
+    sales_records = np.empty(num_records, dtype=_SALES_RECORD_DTYPE)
+    sales_records["date"] = np.repeat(dates.strftime("%Y-%m-%d").to_numpy(), num_items)
+    sales_records["item_id"] = np.tile(np.arange(1, num_items + 1), days)
+    sales_records["quantity"] = quantity.ravel()
+    sales_records["promotion_discount"] = promotion_discount.ravel()
+    sales_records["is_holiday"] = np.repeat(is_holiday, num_items)
+
+    # Insert sales data in chunks so only one chunk is boxed into Python tuples at a time
+    for start in range(0, num_records, SAMPLE_INSERT_CHUNK_SIZE):
+        chunk = sales_records[start : start + SAMPLE_INSERT_CHUNK_SIZE]
+        cursor.executemany(_SALES_INSERT_SQL, chunk.tolist())
+
     conn.commit()
     conn.close()
-    logger.info(f"Created {len(sales_records)} sample sales records")
+    logger.info(f"Created {num_records} sample sales records")
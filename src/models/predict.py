@@ -1,21 +1,90 @@
 """Generate forecasts using trained model."""
 
 import logging
+import uuid
+from contextlib import closing
 from pathlib import Path
 
-import joblib
+import numpy as np
 import pandas as pd
 
+from src.features.build_features import build_latest_features
+from src.models.train import FEATURE_COLS, load_model
 from src.utils.dates import get_date_range, get_today
 from src.utils.db import get_connection
 
 logger = logging.getLogger(__name__)
 
+# Loaded models by path, with the file mtime they were loaded at
+_MODEL_CACHE = {}
+
+
+def _load_model(model_path: Path):
+    """Load a model, reusing the already loaded instance while the file is unchanged."""
+    mtime = model_path.stat().st_mtime_ns
+    cached = _MODEL_CACHE.get(str(model_path))
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    model = load_model(model_path)
+    _MODEL_CACHE[str(model_path)] = (mtime, model)
+    return model
+
+
+def _build_feature_grid(
+    forecast_dates: list,
+    item_ids: pd.Series,
+    last_known: pd.DataFrame,
+    promo_holiday_df: pd.DataFrame,
+) -> pd.DataFrame:
+    """Build model feature rows for each (date, item_id) combination of the forecast period."""
+    grid = pd.MultiIndex.from_product(
+        [forecast_dates, item_ids], names=["date", "item_id"]
+    ).to_frame(index=False)
+    grid = grid.merge(last_known, left_on="item_id", right_index=True, how="left")
+    # Default to no promotion and not a holiday if data not available
+    grid = grid.merge(promo_holiday_df, on=["date", "item_id"], how="left")
+    grid[["lag_1", "lag_7", "rolling_7", "rolling_28", "promotion_discount"]] = grid[
+        ["lag_1", "lag_7", "rolling_7", "rolling_28", "promotion_discount"]
+    ].fillna(0.0)
+    grid["is_holiday"] = grid["is_holiday"].fillna(0).astype(int)
+
+    # Calendar features, parsed once per forecast date; the grid holds each date
+    # for every item in turn, so the per-date values repeat item-count times
+    forecast_datetimes = pd.DatetimeIndex(forecast_dates)
+    n_items = len(item_ids)
+    grid["day_of_week"] = np.repeat(forecast_datetimes.dayofweek.to_numpy(), n_items)
+    grid["month"] = np.repeat(forecast_datetimes.month.to_numpy(), n_items)
+    return grid
+
+
+def _insert_forecasts(conn, forecast_df: pd.DataFrame) -> str:
+    """Insert forecasts in a single transaction under a new run_id, and return it."""
+    run_id = str(uuid.uuid4())
+
+    # The connection context commits on success and rolls back on error
+    with conn:
+        conn.executemany(
+            """INSERT OR REPLACE INTO forecasts
+               (date, item_id, predicted_quantity, run_id)
+               VALUES (?, ?, ?, ?)""",
+            zip(
+                forecast_df["date"].tolist(),
+                forecast_df["item_id"].astype(int).tolist(),
+                forecast_df["predicted_quantity"].astype(float).tolist(),
+                [run_id] * len(forecast_df),
+            ),
+        )
+    return run_id
+
 
-def generate_forecasts(config: dict) -> pd.DataFrame:
+def generate_forecasts(config: dict, sales_df: pd.DataFrame | None = None) -> pd.DataFrame:
     """
     Generate forecasts for the next forecast horizon days.
 
+    sales_df is the historical sales data as returned by load_sales_data; it is
+    loaded from the database when not given.
+
     Returns:
         DataFrame with columns: date, item_id, predicted_quantity
     """
@@ -29,7 +98,7 @@ def generate_forecasts(config: dict) -> pd.DataFrame:
         return pd.DataFrame(columns=["date", "item_id", "predicted_quantity"])
 
     try:
-        model = joblib.load(model_path)
+        model = _load_model(model_path)
         logger.info("Model loaded successfully")
     except Exception as e:
         logger.error(f"Error loading model: {e}")
@@ -39,154 +108,85 @@ def generate_forecasts(config: dict) -> pd.DataFrame:
     horizon = config["forecast"]["horizon"]
     today = get_today()
     forecast_dates = get_date_range(today, horizon)
+    if not forecast_dates:
+        logger.warning(f"Forecast horizon {horizon} covers no dates, returning empty forecasts")
+        return pd.DataFrame(columns=["date", "item_id", "predicted_quantity"])
 
-    # Get all items from database
-    conn = get_connection(config)
-    try:
-        items_df = pd.read_sql_query("SELECT id as item_id FROM items", conn)
-        if items_df.empty:
-            logger.warning("No items found in database, returning empty forecasts")
+    # One connection serves the items and promotion/holiday reads and the
+    # forecast insert, and closing() always closes it
+    with closing(get_connection(config)) as conn:
+        # Get all items from database
+        try:
+            items_df = pd.read_sql_query("SELECT id as item_id FROM items ORDER BY id", conn)
+            if items_df.empty:
+                logger.warning("No items found in database, returning empty forecasts")
+                return pd.DataFrame(columns=["date", "item_id", "predicted_quantity"])
+        except Exception as e:
+            logger.warning(f"Error loading items: {e}, returning empty forecasts")
             return pd.DataFrame(columns=["date", "item_id", "predicted_quantity"])
-    except Exception as e:
-        logger.warning(f"Error loading items: {e}, returning empty forecasts")
-        conn.close()
-        return pd.DataFrame(columns=["date", "item_id", "predicted_quantity"])
-    conn.close()
-
-    # Load historical sales data to build features for forecast period
-    from src.ingest.load_sales import load_sales_data
-
-    sales_df = load_sales_data(config)
-
-    # Build features for forecast period
-    # We need to create feature rows for each (date, item_id) combination
-    forecasts = []
-    feature_cols = [
-        "lag_1",
-        "lag_7",
-        "rolling_7",
-        "rolling_28",
-        "day_of_week",
-        "month",
-        "promotion_discount",
-        "is_holiday",
-        "item_id",
-    ]
-
-    # Try to load promotion/holiday data for forecast dates from database
-    conn = get_connection(config)
-    try:
-        # Use parameterized query to avoid SQL injection
-        placeholders = ",".join(["?" for _ in forecast_dates])
-        query = (
-            f"SELECT date, item_id, "
-            f"COALESCE(promotion_discount, 0) as promotion_discount, "
-            f"COALESCE(is_holiday, 0) as is_holiday "
-            f"FROM daily_item_sales WHERE date IN ({placeholders})"
-        )
-        promo_holiday_df = pd.read_sql_query(query, conn, params=forecast_dates)
-        promo_holiday_df["promotion_discount"] = (
-            promo_holiday_df["promotion_discount"].fillna(0.0).astype(float)
-        )
-        promo_holiday_df["is_holiday"] = promo_holiday_df["is_holiday"].fillna(0).astype(int)
-    except Exception as e:
-        logger.warning(f"Could not load promotion/holiday data for forecast dates: {e}")
-        promo_holiday_df = pd.DataFrame(
-            columns=["date", "item_id", "promotion_discount", "is_holiday"]
-        )
-    conn.close()
-
-    for date in forecast_dates:
-        for _, item_row in items_df.iterrows():
-            item_id = item_row["item_id"]
-
-            # Get the most recent sales data for this item to compute features
-            item_sales = sales_df[sales_df["item_id"] == item_id].copy()
-
-            if not item_sales.empty:
-                item_sales["date"] = pd.to_datetime(item_sales["date"])
-                item_sales = item_sales.sort_values("date")
-
-                # Get last known values for lags and rolling averages
-                lag_1 = item_sales["quantity"].iloc[-1] if len(item_sales) >= 1 else 0.0
-                lag_7 = item_sales["quantity"].iloc[-7] if len(item_sales) >= 7 else 0.0
-                rolling_7 = item_sales["quantity"].tail(7).mean() if len(item_sales) >= 1 else 0.0
-                rolling_28 = item_sales["quantity"].tail(28).mean() if len(item_sales) >= 1 else 0.0
-            else:
-                lag_1 = 0.0
-                lag_7 = 0.0
-                rolling_7 = 0.0
-                rolling_28 = 0.0
-
-            # Calendar features for forecast date
-            date_obj = pd.to_datetime(date)
-            day_of_week = date_obj.dayofweek
-            month = date_obj.month
-
-            # Get promotion and holiday data for this date/item combination
-            promo_holiday_row = promo_holiday_df[
-                (promo_holiday_df["date"] == date) & (promo_holiday_df["item_id"] == item_id)
-            ]
-            if not promo_holiday_row.empty:
-                promotion_discount = float(promo_holiday_row["promotion_discount"].iloc[0])
-                is_holiday = int(promo_holiday_row["is_holiday"].iloc[0])
-            else:
-                # Default to no promotion and not a holiday if data not available
-                promotion_discount = 0.0
-                is_holiday = 0
-
-            # Build feature vector
-            x_features = pd.DataFrame(
-                [
-                    [
-                        lag_1,
-                        lag_7,
-                        rolling_7,
-                        rolling_28,
-                        day_of_week,
-                        month,
-                        promotion_discount,
-                        is_holiday,
-                        item_id,
-                    ]
-                ],
-                columns=feature_cols,
-            )
 
-            # Make prediction
-            try:
-                predicted_quantity = float(model.predict(x_features)[0])
-                # Ensure non-negative
-                predicted_quantity = max(0.0, predicted_quantity)
-            except Exception as e:
-                logger.warning(f"Error predicting for item {item_id} on {date}: {e}")
-                predicted_quantity = 0.0
-
-            forecasts.append(
-                {"date": date, "item_id": item_id, "predicted_quantity": predicted_quantity}
+        # Load historical sales data to build features for forecast period, unless
+        # the caller already has it
+        if sales_df is None:
+            from src.ingest.load_sales import load_sales_data
+
+            sales_df = load_sales_data(config)
+
+        # Try to load promotion/holiday data for forecast dates from database
+        try:
+            # Forecast dates are contiguous, so a date range selects exactly those days
+            # without one placeholder per date
+            query = (
+                "SELECT date, item_id, "
+                "COALESCE(promotion_discount, 0) as promotion_discount, "
+                "COALESCE(is_holiday, 0) as is_holiday "
+                "FROM daily_item_sales WHERE date BETWEEN ? AND ?"
+            )
+            promo_holiday_df = pd.read_sql_query(
+                query, conn, params=(min(forecast_dates), max(forecast_dates))
+            )
+            # COALESCE already guarantees non-null values, so only compact dtypes are
+            # set. promotion_discount stays float64 to match the values the model was
+            # trained on; item_id still merges against the grid's int64 item_id
+            promo_holiday_df = promo_holiday_df.astype(
+                {"item_id": "int32", "promotion_discount": "float64", "is_holiday": "int8"}
+            )
+        except Exception as e:
+            logger.warning(f"Could not load promotion/holiday data for forecast dates: {e}")
+            promo_holiday_df = pd.DataFrame(
+                columns=["date", "item_id", "promotion_discount", "is_holiday"]
+            ).astype(
+                {
+                    "date": str,
+                    "item_id": "int32",
+                    "promotion_discount": "float64",
+                    "is_holiday": "int8",
+                }
             )
 
-    forecast_df = pd.DataFrame(forecasts)
-
-    # Write to database
-    if not forecast_df.empty:
-        conn = get_connection(config)
-        cursor = conn.cursor()
-
-        import uuid
+        # Get last known values for lags and rolling averages of every item
+        last_known = build_latest_features(sales_df)
 
-        run_id = str(uuid.uuid4())
+        grid = _build_feature_grid(
+            forecast_dates, items_df["item_id"], last_known, promo_holiday_df
+        )
 
-        for _, row in forecast_df.iterrows():
-            cursor.execute(
-                """INSERT OR REPLACE INTO forecasts
-                   (date, item_id, predicted_quantity, run_id)
-                   VALUES (?, ?, ?, ?)""",
-                (row["date"], row["item_id"], row["predicted_quantity"], run_id),
+        # Predict all rows in one call, ensuring non-negative quantities
+        try:
+            predictions = np.clip(
+                np.asarray(model.predict(grid[FEATURE_COLS]), dtype=float), 0.0, None
             )
+        except Exception as e:
+            logger.warning(f"Error predicting forecasts: {e}")
+            predictions = np.zeros(len(grid))
+
+        forecast_df = pd.DataFrame(
+            {"date": grid["date"], "item_id": grid["item_id"], "predicted_quantity": predictions}
+        )
 
-        conn.commit()
-        conn.close()
+        # Write to database (the grid has a row for every forecast date and item,
+        # both checked non-empty above)
+        run_id = _insert_forecasts(conn, forecast_df)
         logger.info(f"Forecasts written to database with run_id: {run_id}")
 
     logger.info(f"Generated {len(forecast_df)} forecasts")
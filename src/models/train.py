@@ -1,5 +1,6 @@
 """Model training functionality."""
 
+import json
 import logging
 from pathlib import Path
 
@@ -18,11 +19,12 @@ except (ImportError, OSError):
     CatBoostRegressor = None
 
 try:
-    from lightgbm import LGBMRegressor
+    from lightgbm import Booster, LGBMRegressor
 
     LIGHTGBM_AVAILABLE = True
 except (ImportError, OSError):
     LIGHTGBM_AVAILABLE = False
+    Booster = None
     LGBMRegressor = None
 
 try:
@@ -35,6 +37,19 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Model input columns, shared by training and forecasting
+FEATURE_COLS = [
+    "lag_1",
+    "lag_7",
+    "rolling_7",
+    "rolling_28",
+    "day_of_week",
+    "month",
+    "promotion_discount",
+    "is_holiday",
+    "item_id",
+]
+
 
 def _get_model(config: dict):
     """Get model instance based on config and availability."""
@@ -53,6 +68,37 @@ def _get_model(config: dict):
         )
 
 
+def save_model(model, model_path: Path) -> None:
+    """
+    Save a trained model to disk.
+
+    CatBoost and LightGBM models use their native binary/text formats, which load
+    faster than unpickling; other models are stored with joblib (uncompressed).
+    """
+    if CATBOOST_AVAILABLE and isinstance(model, CatBoostRegressor):
+        model.save_model(str(model_path))
+    elif LIGHTGBM_AVAILABLE and isinstance(model, LGBMRegressor):
+        model.booster_.save_model(str(model_path))
+    else:
+        joblib.dump(model, model_path, compress=0)
+
+
+def load_model(model_path: Path):
+    """Load a model saved by save_model, detecting its format from the file header."""
+    with open(model_path, "rb") as f:
+        header = f.read(4)
+
+    if header == b"CBM1":
+        if not CATBOOST_AVAILABLE:
+            raise ImportError("catboost is required to load this model")
+        return CatBoostRegressor().load_model(str(model_path))
+    if header == b"tree":
+        if not LIGHTGBM_AVAILABLE:
+            raise ImportError("lightgbm is required to load this model")
+        return Booster(model_file=str(model_path))
+    return joblib.load(model_path)
+
+
 def train_model(features_df: pd.DataFrame, config: dict) -> tuple:
     """
     Train a global ML model on historical features.
@@ -67,20 +113,7 @@ def train_model(features_df: pd.DataFrame, config: dict) -> tuple:
         # Create a minimal model that will predict zeros
         model = _get_model(config)
         # Train on dummy data
-        x_dummy = pd.DataFrame(
-            [[0, 0, 0, 0, 0, 0, 0, 0, 0]],
-            columns=[
-                "lag_1",
-                "lag_7",
-                "rolling_7",
-                "rolling_28",
-                "day_of_week",
-                "month",
-                "promotion_discount",
-                "is_holiday",
-                "item_id",
-            ],
-        )
+        x_dummy = pd.DataFrame([[0] * len(FEATURE_COLS)], columns=FEATURE_COLS)
         y_dummy = pd.Series([0])
         model.fit(x_dummy, y_dummy)
     else:
@@ -89,18 +122,7 @@ def train_model(features_df: pd.DataFrame, config: dict) -> tuple:
         model = _get_model(config)
 
         # Prepare features and target
-        feature_cols = [
-            "lag_1",
-            "lag_7",
-            "rolling_7",
-            "rolling_28",
-            "day_of_week",
-            "month",
-            "promotion_discount",
-            "is_holiday",
-            "item_id",
-        ]
-        available_cols = [col for col in feature_cols if col in features_df.columns]
+        available_cols = [col for col in FEATURE_COLS if col in features_df.columns]
 
         if "quantity" in features_df.columns:
             x_features = features_df[available_cols].fillna(0)
@@ -118,7 +140,7 @@ def train_model(features_df: pd.DataFrame, config: dict) -> tuple:
     model_dir.mkdir(parents=True, exist_ok=True)
     model_path = model_dir / "latest.model"
 
-    joblib.dump(model, model_path)
+    save_model(model, model_path)
     logger.info(f"Model saved to {model_path}")
 
     # Create metrics dict
@@ -134,7 +156,7 @@ def train_model(features_df: pd.DataFrame, config: dict) -> tuple:
         run_id = str(uuid.uuid4())
         cursor.execute(
             "INSERT INTO model_runs (run_id, timestamp, metrics, model_type) VALUES (?, ?, ?, ?)",
-            (run_id, datetime.now().isoformat(), str(metrics), config["model"]["type"]),
+            (run_id, datetime.now().isoformat(), json.dumps(metrics), config["model"]["type"]),
         )
         conn.commit()
         conn.close()
@@ -110,7 +110,7 @@ def main():
         logger.info("=" * 50)
         logger.info("Step 4: Generating forecasts")
         logger.info("=" * 50)
-        forecasts_df = generate_forecasts(config)
+        forecasts_df = generate_forecasts(config, sales_df=sales_df)
 
         logger.info("=" * 50)
         logger.info("Pipeline completed successfully!")
@@ -1,8 +1,11 @@
 """Date utility functions."""
 
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import List
 
+import numpy as np
+import pandas as pd
+
 
 def get_today() -> str:
     """Get today's date as YYYY-MM-DD string."""
@@ -11,9 +14,7 @@ def get_today() -> str:
 
 def add_days(date_str: str, days: int) -> str:
     """Add days to a date string and return as YYYY-MM-DD."""
-    date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-    new_date = date_obj + timedelta(days=days)
-    return new_date.strftime("%Y-%m-%d")
+    return str(np.datetime64(date_str, "D") + days)
 
 
 def format_date(date_obj: datetime) -> str:
@@ -23,9 +24,4 @@ def format_date(date_obj: datetime) -> str:
 
 def get_date_range(start_date: str, days: int) -> List[str]:
     """Get a list of date strings from start_date for the specified number of days."""
-    dates = []
-    current = datetime.strptime(start_date, "%Y-%m-%d")
-    for _ in range(days):
-        dates.append(current.strftime("%Y-%m-%d"))
-        current += timedelta(days=1)
-    return dates
+    return pd.date_range(start_date, periods=days, freq="D").strftime("%Y-%m-%d").tolist()
@@ -24,11 +24,17 @@ def init_database(config: dict) -> None:
     conn = sqlite3.connect(str(db_path))
     cursor = conn.cursor()
 
+    # WAL journal mode is persistent in the database file; synchronous=NORMAL is
+    # safe with WAL and avoids an fsync per transaction
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+
     # Create items table
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS items (
             id INTEGER PRIMARY KEY,
             name TEXT NOT NULL,
+            referencia TEXT,
             created_at TEXT DEFAULT CURRENT_TIMESTAMP
         )
     """)
@@ -57,6 +63,15 @@ def init_database(config: dict) -> None:
     except sqlite3.OperationalError:
         pass  # Column already exists
 
+    try:
+        cursor.execute("ALTER TABLE items ADD COLUMN referencia TEXT")
+    except sqlite3.OperationalError:
+        pass  # Column already exists
+
+    # Index item references for HIPOS lookups (sales are already ordered by the
+    # (date, item_id) primary key index)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_items_referencia ON items(referencia)")
+
     # Create forecasts table
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS forecasts (
@@ -79,6 +94,14 @@ def init_database(config: dict) -> None:
         )
     """)
 
+    # Indexes for item-scoped sales scans (item history, ORDER BY item_id, date)
+    # and run lookups on forecasts. Date-ordered access on both tables is
+    # already covered by their (date, ...) primary keys.
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_sales_item_date ON daily_item_sales(item_id, date)"
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_forecasts_runid ON forecasts(run_id)")
+
     conn.commit()
     conn.close()
 
@@ -88,4 +111,12 @@ def init_database(config: dict) -> None:
 def get_connection(config: dict) -> sqlite3.Connection:
     """Get a connection to the database."""
     db_path = get_db_path(config)
-    return sqlite3.connect(str(db_path))
+    conn = sqlite3.connect(str(db_path))
+    # synchronous is a per-connection setting (journal_mode=WAL is set by init_database)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def configure_bulk_write(conn: sqlite3.Connection) -> None:
+    """Apply PRAGMA settings suited to bulk inserts on a connection."""
+    conn.executescript("PRAGMA temp_store=MEMORY; PRAGMA cache_size=-65536;")
@@ -13,10 +13,10 @@ def mean_absolute_error(
     if len(y_true) == 0 or len(y_pred) == 0:
         return 0.0
 
-    y_true = np.array(y_true)
-    y_pred = np.array(y_pred)
+    abs_error = np.subtract(np.asarray(y_true, dtype=float), np.asarray(y_pred, dtype=float))
+    np.abs(abs_error, out=abs_error)
 
-    return float(np.mean(np.abs(y_true - y_pred)))
+    return float(abs_error.mean())
 
 
 def weighted_absolute_percentage_error(
@@ -26,11 +26,12 @@ def weighted_absolute_percentage_error(
     if len(y_true) == 0 or len(y_pred) == 0:
         return 0.0
 
-    y_true = np.array(y_true)
-    y_pred = np.array(y_pred)
+    y_true = np.asarray(y_true, dtype=float)
+    abs_error = np.subtract(y_true, np.asarray(y_pred, dtype=float))
+    np.abs(abs_error, out=abs_error)
 
-    numerator = np.sum(np.abs(y_true - y_pred))
-    denominator = np.sum(np.abs(y_true))
+    numerator = abs_error.sum()
+    denominator = np.abs(y_true).sum()
 
     if denominator == 0:
         return 0.0